@@ -1,19 +1,64 @@
-import sys
-import math
 import audioop
-import tempfile
-import datetime
+import contextlib
+import io
+import itertools
+import os
+import queue
+import sys
+import subprocess
+import threading
+import time
+import urllib.request
 import json
+import logging
 from collections import deque
+from fractions import Fraction
 from pathlib import Path
 from typing import Optional
 
 import pyaudio
+import requests
 from PyQt6 import QtCore, QtWidgets, QtMultimedia
+from requests.adapters import HTTPAdapter
 
+import gtts.tts
 import speech_recognition as sr
 from gtts import gTTS
-from pydub import AudioSegment
+
+try:
+    import av
+except ImportError:  # PyAV is optional; without it TTS falls back to the ffmpeg CLI
+    av = None
+
+liburing = None
+if sys.platform.startswith("linux"):
+    try:
+        import liburing
+    except ImportError:  # io_uring config writes are optional; plain writes are used otherwise
+        pass
+
+log = logging.getLogger(__name__)
+
+TTS_HOST_URL = "https://translate.google.com/"
+
+
+class SharedSessionRequests:
+    # Stand-in for the `requests` module inside gtts.tts: gTTS opens `with requests.Session()`
+    # per request, so hand it one persistent session and keep its TLS connection alive.
+
+    def __init__(self, session: requests.Session):
+        self._session = session
+
+    def Session(self):  # noqa: N802
+        return contextlib.nullcontext(self._session)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+_tts_session = requests.Session()
+_tts_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
+gtts.tts.requests = SharedSessionRequests(_tts_session)
 
 # (label, STT code, TTS code)
 LANG_OPTIONS = [
@@ -30,21 +75,183 @@ LANG_OPTIONS = [
 ]
 
 
-def speed_change(segment: AudioSegment, factor: float) -> AudioSegment:
-    # Change frame rate to alter speed without changing pitch
-    new_sr = int(segment.frame_rate * factor)
-    return segment._spawn(segment.raw_data, overrides={"frame_rate": new_sr}).set_frame_rate(segment.frame_rate)
+def atempo_chain(factor: float) -> str:
+    # atempo accepts 0.5..2.0 per stage, so split larger factors into several stages
+    stages = []
+    while factor > 2.0:
+        stages.append(2.0)
+        factor /= 2.0
+    while factor < 0.5:
+        stages.append(0.5)
+        factor /= 0.5
+    stages.append(factor)
+    return ",".join(f"atempo={stage:g}" for stage in stages)
 
 
-def volume_gain_db(volume_factor: float) -> float:
-    # Convert linear volume factor (0.1..2.0) to decibels
+def tts_filter_graph(speed_factor: float, volume_factor: float) -> str:
+    # Tempo change keeps pitch; volume is a linear factor (0.1..2.0)
     volume_factor = max(0.1, min(volume_factor, 2.0))
-    return 20 * math.log10(volume_factor)
+    return f"{atempo_chain(speed_factor)},volume={volume_factor:g}"
+
+
+def run_ffmpeg(args: list, input_data: bytes = b"") -> bytes:
+    # Hide the console window that Windows would open for the child process in the .exe build
+    flags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", *args], input=input_data, capture_output=True, creationflags=flags
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip() or "ffmpeg завершився з помилкою")
+    return result.stdout
+
+
+def render_with_pyav(source, filters: str, outputs: list) -> None:
+    # Decode, filter and encode in-process; source and output targets may be paths or file objects,
+    # outputs are (target, format, codec) tuples
+    with av.open(source, format="mp3") as src:
+        in_stream = src.streams.audio[0]
+        rate = in_stream.codec_context.sample_rate
+        layout = in_stream.codec_context.layout
+        src_format = in_stream.codec_context.format
+
+        graph = av.filter.Graph()
+        node = graph.add_abuffer(template=in_stream)
+        for spec in filters.split(","):
+            name, _, args = spec.partition("=")
+            next_node = graph.add(name, args)
+            node.link_to(next_node)
+            node = next_node
+        node.link_to(graph.add("abuffersink"))
+        graph.configure()
+
+        targets = []
+        try:
+            for target, fmt, codec in outputs:
+                container = av.open(target, "w", format=fmt)
+                stream = container.add_stream(codec, rate=rate)
+                stream.codec_context.layout = layout
+                # Encode in the decoder's sample format when possible so frames skip a conversion pass
+                if any(f.name == src_format.name for f in stream.codec_context.codec.audio_formats or ()):
+                    stream.codec_context.format = src_format
+                targets.append((container, stream))
+
+            samples = 0
+
+            def encode(frame):
+                nonlocal samples
+                frame.pts = samples
+                frame.time_base = Fraction(1, rate)
+                samples += frame.samples
+                for container, stream in targets:
+                    container.mux(stream.encode(frame))
+
+            def drain():
+                while True:
+                    try:
+                        encode(graph.pull())
+                    except (av.BlockingIOError, av.EOFError):
+                        return
+
+            for frame in src.decode(in_stream):
+                graph.push(frame)
+                drain()
+            graph.push(None)
+            drain()
+            for container, stream in targets:
+                container.mux(stream.encode(None))
+        finally:
+            for container, _ in targets:
+                container.close()
+
+
+def write_file_synced(path: Path, payload: bytes) -> None:
+    # Raw fd write + fdatasync (fsync on Windows); O_BINARY keeps Windows from translating newlines
+    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+        getattr(os, "fdatasync", os.fsync)(fd)
+    finally:
+        os.close(fd)
+
+
+class UringFileWriter:
+    # Writes whole files through an io_uring ring on a daemon thread, so callers never block.
+    # Only the newest pending payload is written; older ones are superseded.
+
+    def __init__(self, entries: int = 8):
+        self._ring = liburing.io_uring()
+        self._cqe = liburing.io_uring_cqe()
+        liburing.io_uring_queue_init(entries, self._ring, 0)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path: Path, payload: bytes):
+        self._queue.put((path, payload))
+
+    def close(self):
+        # Flush whatever is still queued before tearing the ring down
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        try:
+            while True:
+                job = self._queue.get()
+                stop = job is None
+                while not self._queue.empty():
+                    newer = self._queue.get_nowait()
+                    stop = stop or newer is None
+                    job = newer or job
+                if job:
+                    self._write(*job)
+                if stop:
+                    return
+        finally:
+            liburing.io_uring_queue_exit(self._ring)
+
+    def _write(self, path: Path, payload: bytes):
+        try:
+            fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        except OSError:
+            return
+        try:
+            iov = liburing.iovec(payload)
+            sqe = liburing.io_uring_get_sqe(self._ring)
+            liburing.io_uring_prep_writev(sqe, fd, iov, len(iov), 0)
+            liburing.io_uring_submit(self._ring)
+            liburing.io_uring_wait_cqe(self._ring, self._cqe)
+            written = self._cqe.res
+            liburing.io_uring_cqe_seen(self._ring, self._cqe)
+            if written == len(payload):
+                os.fdatasync(fd)
+                return
+        except Exception:
+            pass
+        finally:
+            os.close(fd)
+        # Short or failed async write: redo it synchronously instead of leaving a truncated file
+        try:
+            write_file_synced(path, payload)
+        except OSError:
+            pass
+
+
+def warm_up_tts_session() -> None:
+    # Resolve DNS and finish the TLS handshake before the first Play click. Same verify/proxy
+    # settings as gTTS uses, otherwise urllib3 would park the connection in a different pool.
+    try:
+        requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+        _tts_session.head(TTS_HOST_URL, verify=False, proxies=urllib.request.getproxies(), timeout=5)
+    except Exception:
+        pass
 
 
 class TTSWorker(QtCore.QThread):
     finished = QtCore.pyqtSignal(str)
-    playback_ready = QtCore.pyqtSignal(str)
+    playback_ready = QtCore.pyqtSignal(bytes)
     error = QtCore.pyqtSignal(str)
     status = QtCore.pyqtSignal(str)
 
@@ -59,20 +266,26 @@ class TTSWorker(QtCore.QThread):
     def run(self):
         try:
             self.status.emit("Синтезую...")
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_mp3:
-                gtts_obj = gTTS(text=self.text, lang=self.lang_code)
-                gtts_obj.save(tmp_mp3.name)
-
-            segment = AudioSegment.from_file(tmp_mp3.name, format="mp3")
-            segment = speed_change(segment, self.speed_factor)
-            segment = segment + volume_gain_db(self.volume_factor)
+            # Keep the whole pipeline in memory: gTTS bytes -> filter/encode -> player buffer
+            src_buf = io.BytesIO()
+            gtts_obj = gTTS(text=self.text, lang=self.lang_code)
+            gtts_obj.write_to_fp(src_buf)
+            src_buf.seek(0)
+
+            filters = tts_filter_graph(self.speed_factor, self.volume_factor)
+            if av is not None:
+                out_buf = io.BytesIO()
+                render_with_pyav(src_buf, filters, [(out_buf, "mp3", "libmp3lame")])
+                mp3_bytes = out_buf.getvalue()
+            else:
+                mp3_bytes = run_ffmpeg(
+                    ["-f", "mp3", "-i", "pipe:0", "-filter:a", filters, "-c:a", "libmp3lame", "-f", "mp3", "pipe:1"],
+                    src_buf.getvalue(),
+                )
 
             if self.save_path:
-                segment.export(self.save_path, format="mp3")
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_wav:
-                segment.export(tmp_wav.name, format="wav")
-                self.playback_ready.emit(tmp_wav.name)
+                self.save_path.write_bytes(mp3_bytes)
+            self.playback_ready.emit(mp3_bytes)
 
             self.finished.emit("Готово")
         except Exception as exc:  # noqa: BLE001
@@ -81,7 +294,99 @@ class TTSWorker(QtCore.QThread):
             self.status.emit("")
 
 
+class MicScanWorker(QtCore.QThread):
+    mics_ready = QtCore.pyqtSignal(list)
+
+    def __init__(self, pa: Optional[pyaudio.PyAudio], probe_cache: dict, parent=None):
+        super().__init__(parent)
+        self.pa = pa
+        self.probe_cache = probe_cache
+
+    def probe(self, idx: int, info: dict) -> bool:
+        # Format probes go through the audio driver, so remember them until a hardware rescan
+        key = (info.get("name"), info.get("defaultSampleRate"), info.get("maxInputChannels"))
+        supported = self.probe_cache.get(key)
+        if supported is None:
+            try:
+                self.pa.is_format_supported(
+                    rate=int(info.get("defaultSampleRate", 16000)),
+                    input_device=idx,
+                    input_channels=1,
+                    input_format=pyaudio.paInt16,
+                )
+                supported = True
+            except Exception:
+                supported = False
+            self.probe_cache[key] = supported
+        return supported
+
+    def run(self):
+        active_mics = []
+        try:
+            if self.pa:
+                for idx in range(self.pa.get_device_count()):
+                    info = self.pa.get_device_info_by_index(idx)
+                    if info.get("maxInputChannels", 0) <= 0:
+                        continue
+                    if not self.probe(idx, info):
+                        continue
+                    name = info.get("name", f"Device {idx}")
+                    active_mics.append((idx, name))
+        except Exception:
+            active_mics = []
+        self.mics_ready.emit(active_mics)
+
+
+class MicCalibrationWorker(QtCore.QThread):
+    calibrated = QtCore.pyqtSignal(int, float)
+    failed = QtCore.pyqtSignal(int, str)
+
+    def __init__(self, device_index: int, parent=None):
+        super().__init__(parent)
+        self.device_index = device_index
+
+    def run(self):
+        # Ambient-noise sampling blocks for its whole duration, so keep it off the GUI thread
+        try:
+            recognizer = sr.Recognizer()
+            with sr.Microphone(device_index=self.device_index) as source:
+                recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            self.calibrated.emit(self.device_index, float(recognizer.energy_threshold))
+        except Exception as exc:  # noqa: BLE001
+            self.failed.emit(self.device_index, str(exc))
+
+
+class STTRecognitionTask(QtCore.QRunnable):
+    def __init__(self, recognizer: sr.Recognizer, audio: sr.AudioData, lang_code: str, seq: int, done):
+        super().__init__()
+        self.recognizer = recognizer
+        self.audio = audio
+        self.lang_code = lang_code
+        self.seq = seq
+        self.done = done
+
+    def run(self):
+        text = ""
+        try:
+            text = self.recognizer.recognize_google(self.audio, language=self.lang_code)
+            message = f"STT [{self.lang_code}]: {text}"
+        except sr.UnknownValueError:
+            message = "STT: не вдалося розпізнати фразу"
+        except sr.RequestError:
+            message = "STT: проблема з підключенням до сервісу"
+        except Exception as exc:  # noqa: BLE001
+            message = f"STT помилка: {exc}"
+        try:
+            self.done(self.seq, self.lang_code, text, message)
+        except (RuntimeError, AttributeError):
+            # The window was torn down while this phrase was in flight; drop the late result
+            pass
+
+
 class MainWindow(QtWidgets.QMainWindow):
+    # (sequence number, language, recognized text or "", history line); emitted from pool threads
+    stt_result = QtCore.pyqtSignal(int, str, str, str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Speech <-> Text Tool (PyQt6)")
@@ -90,25 +395,69 @@ class MainWindow(QtWidgets.QMainWindow):
         self.history = deque(maxlen=10)
         self.stt_stop = None
         self.recognizer = sr.Recognizer()
+        # The threshold is calibrated once per microphone instead of drifting on every phrase
+        self.recognizer.dynamic_energy_threshold = False
+        self._mic_energy: dict[int, float] = {}
+        # (device index, language) of a start that is waiting for its calibration
+        self._stt_pending_start: Optional[tuple[int, str]] = None
+        self._mic_calibrations: list[MicCalibrationWorker] = []
+        # Phrases are recognized concurrently; results are replayed in capture order
+        self._stt_pool = QtCore.QThreadPool(self)
+        self._stt_pool.setMaxThreadCount(4)
+        self._closing = False
+        self._stt_seq = itertools.count()
+        self._stt_next_seq = 0
+        self._stt_results: dict[int, tuple[str, str, str]] = {}
+        self.stt_result.connect(self.on_stt_result)
+        # Recognized phrases arriving within 100 ms are shown with one append and one history line
+        self._stt_pending: list[tuple[str, str]] = []
+        self._stt_flush_timer = QtCore.QTimer(self)
+        self._stt_flush_timer.setSingleShot(True)
+        self._stt_flush_timer.setInterval(100)
+        self._stt_flush_timer.timeout.connect(self.flush_stt_pending)
         self.config_path = self._compute_config_path()
         self.config = {}
+        self._last_config_payload = None
         self.loading_config = True
         self.last_save_dir = Path.home()
         self.load_config()
         self.active_mics = []
-
-        self.sound_effect = QtMultimedia.QSoundEffect(self)
+        self._pa = self._open_pyaudio()
+        self._mic_probe_cache: dict[tuple, bool] = {}
+        self._mic_scan: Optional[MicScanWorker] = None
+        self._config_writer = self._open_config_writer()
+
+        # Coalesce bursts of setting changes (e.g. slider drags) into one write
+        self._save_timer = QtCore.QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(250)
+        self._save_timer.timeout.connect(self._do_save_settings)
+
+        self.audio_output = QtMultimedia.QAudioOutput(self)
+        self.player = QtMultimedia.QMediaPlayer(self)
+        self.audio_output.setMuted(False)
+        self.player.setAudioOutput(self.audio_output)
+        self._tts_buffer = QtCore.QBuffer(self)
+        self._last_tts_bytes = None
         self.should_play = True
 
+        # Fire-and-forget: a daemon thread never holds up closing the window, even offline
+        threading.Thread(target=warm_up_tts_session, name="tts-warmup", daemon=True).start()
+
         self.vu_timer = QtCore.QTimer(self)
-        self.vu_timer.setInterval(100)
+        self.vu_timer.setInterval(50)
         self.vu_timer.timeout.connect(self.update_vu_level)
-        self.vu_audio = None
         self.vu_stream = None
+        self._vu_level = 0
+        self._vu_lock = threading.Lock()
 
         self.init_ui()
 
     def init_ui(self):
+        devices_menu = self.menuBar().addMenu("Пристрої")
+        rescan_action = devices_menu.addAction("Пересканувати обладнання")
+        rescan_action.triggered.connect(self.rescan_hardware)
+
         tabs = QtWidgets.QTabWidget()
 
         # STT tab
@@ -128,9 +477,9 @@ class MainWindow(QtWidgets.QMainWindow):
         mic_box.addWidget(QtWidgets.QLabel("Мікрофон:"))
         self.mic_combo = QtWidgets.QComboBox()
         mic_box.addWidget(self.mic_combo, 1)
-        refresh_mics = QtWidgets.QPushButton("Оновити")
-        refresh_mics.clicked.connect(self.populate_microphones)
-        mic_box.addWidget(refresh_mics)
+        self.btn_refresh_mics = QtWidgets.QPushButton("Оновити")
+        self.btn_refresh_mics.clicked.connect(self.populate_microphones)
+        mic_box.addWidget(self.btn_refresh_mics)
         mic_box.addStretch()
         stt_layout.addLayout(mic_box)
 
@@ -255,8 +604,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.restore_settings()
 
     # ---------- STT ----------
+    def _recording_active(self) -> bool:
+        return bool(self.stt_stop or self._stt_pending_start)
+
     def start_recording(self):
-        if self.stt_stop:
+        if self._recording_active():
             return
         lang_code = self.stt_lang.currentData()
         mic_index = self.mic_combo.currentData()
@@ -265,31 +617,86 @@ class MainWindow(QtWidgets.QMainWindow):
             return
         try:
             mic_index_int = int(mic_index)
-            mic = sr.Microphone(device_index=mic_index_int)
-        except Exception as exc:  # noqa: BLE001
+        except (TypeError, ValueError) as exc:
             QtWidgets.QMessageBox.critical(self, "Помилка", f"Помилка ініціалізації мікрофона: {exc}")
             return
 
-        self.stt_status.setText("Слухаю...")
         self.stt_progress.setVisible(True)
         self.btn_start.setEnabled(False)
         self.btn_stop.setEnabled(True)
+        self.btn_refresh_mics.setEnabled(False)
         self.start_vu_meter(mic_index_int)
 
+        if mic_index_int in self._mic_energy:
+            self._begin_listening(mic_index_int, lang_code)
+            return
+        self.stt_status.setText("Калібрую мікрофон...")
+        self._stt_pending_start = (mic_index_int, lang_code)
+        if not any(w.device_index == mic_index_int and w.isRunning() for w in self._mic_calibrations):
+            worker = MicCalibrationWorker(mic_index_int, self)
+            worker.calibrated.connect(self.on_mic_calibrated)
+            worker.failed.connect(self.on_mic_calibration_failed)
+            worker.finished.connect(lambda w=worker: self._mic_calibrations.remove(w))
+            worker.finished.connect(worker.deleteLater)
+            self._mic_calibrations.append(worker)
+            worker.start()
+
+    def on_mic_calibrated(self, device_index: int, threshold: float):
+        self._mic_energy[device_index] = threshold
+        pending = self._stt_pending_start
+        if pending and pending[0] == device_index:
+            self._stt_pending_start = None
+            self._begin_listening(*pending)
+
+    def on_mic_calibration_failed(self, device_index: int, message: str):
+        pending = self._stt_pending_start
+        if pending and pending[0] == device_index:
+            self.stop_recording()
+            QtWidgets.QMessageBox.critical(self, "Помилка", f"Помилка ініціалізації мікрофона: {message}")
+
+    def _begin_listening(self, device_index: int, lang_code: str):
+        # A fresh Microphone per session: a stopped listener may still be inside the previous one
+        try:
+            mic = sr.Microphone(device_index=device_index)
+        except Exception as exc:  # noqa: BLE001
+            self.stop_recording()
+            QtWidgets.QMessageBox.critical(self, "Помилка", f"Помилка ініціалізації мікрофона: {exc}")
+            return
+        self.recognizer.energy_threshold = self._mic_energy[device_index]
+        self.stt_status.setText("Слухаю...")
+
         def callback(_, audio):
-            try:
-                text = self.recognizer.recognize_google(audio, language=lang_code)
-                self.stt_text.appendPlainText(text)
-                self.add_history(f"STT [{lang_code}]: {text}")
-            except sr.UnknownValueError:
-                self.add_history("STT: не вдалося розпізнати фразу")
-            except sr.RequestError:
-                self.add_history("STT: проблема з підключенням до сервісу")
-            except Exception as exc_inner:  # noqa: BLE001
-                self.add_history(f"STT помилка: {exc_inner}")
+            # Runs on the listener thread: hand the phrase off so the next one can be captured
+            if self._closing:
+                return
+            task = STTRecognitionTask(self.recognizer, audio, lang_code, next(self._stt_seq), self.stt_result.emit)
+            self._stt_pool.start(task)
 
         self.stt_stop = self.recognizer.listen_in_background(mic, callback)
 
+    def on_stt_result(self, seq: int, lang_code: str, text: str, message: str):
+        self._stt_results[seq] = (lang_code, text, message)
+        while self._stt_next_seq in self._stt_results:
+            lang_code, text, message = self._stt_results.pop(self._stt_next_seq)
+            self._stt_next_seq += 1
+            if text:
+                self._stt_pending.append((lang_code, text))
+                if not self._stt_flush_timer.isActive():
+                    self._stt_flush_timer.start()
+            else:
+                # Keep history in capture order: earlier phrases go in before the failure line
+                self.flush_stt_pending()
+                self.add_history(message)
+
+    def flush_stt_pending(self):
+        self._stt_flush_timer.stop()
+        if not self._stt_pending:
+            return
+        self.stt_text.appendPlainText("\n".join(text for _, text in self._stt_pending))
+        for lang_code, group in itertools.groupby(self._stt_pending, key=lambda item: item[0]):
+            self.add_history(f"STT [{lang_code}]: {' '.join(text for _, text in group)}")
+        self._stt_pending.clear()
+
     def stop_recording(self):
         if self.stt_stop:
             try:
@@ -297,10 +704,12 @@ class MainWindow(QtWidgets.QMainWindow):
             except Exception:
                 pass
         self.stt_stop = None
+        self._stt_pending_start = None
         self.stt_status.setText("Зупинено")
         self.stt_progress.setVisible(False)
         self.btn_start.setEnabled(True)
         self.btn_stop.setEnabled(False)
+        self.btn_refresh_mics.setEnabled(True)
         self.stop_vu_meter()
 
     # ---------- TTS ----------
@@ -336,15 +745,22 @@ class MainWindow(QtWidgets.QMainWindow):
         self.tts_worker.playback_ready.connect(self.on_playback_ready)
         self.tts_worker.start()
 
-    def on_playback_ready(self, wav_path: str):
+    def on_playback_ready(self, mp3_bytes: bytes):
         if not self.should_play:
             return
-        self.sound_effect.stop()
-        self.sound_effect.setSource(QtCore.QUrl.fromLocalFile(wav_path))
-        self.sound_effect.setLoopCount(1)
+        self.player.stop()
+        if mp3_bytes != self._last_tts_bytes:
+            # Detach the buffer from the player before swapping its contents
+            self.player.setSource(QtCore.QUrl())
+            self._tts_buffer.close()
+            self._tts_buffer.setData(mp3_bytes)
+            self._tts_buffer.open(QtCore.QIODevice.OpenModeFlag.ReadOnly)
+            # The URL is only a format hint for the backend
+            self.player.setSourceDevice(self._tts_buffer, QtCore.QUrl("tts.mp3"))
+            self._last_tts_bytes = mp3_bytes
         vol = max(0, min(100, self.volume_slider.value()))
-        self.sound_effect.setVolume(vol / 100.0)
-        self.sound_effect.play()
+        self.audio_output.setVolume(vol / 100.0)
+        self.player.play()
 
     def on_tts_done(self, msg: str):
         self.tts_status.setText(msg)
@@ -362,25 +778,30 @@ class MainWindow(QtWidgets.QMainWindow):
 
     # ---------- History & Export ----------
     def add_history(self, entry: str):
-        stamp = datetime.datetime.now().strftime("%H:%M:%S")
+        now = time.localtime()
+        stamp = f"{now.tm_hour:02d}:{now.tm_min:02d}:{now.tm_sec:02d}"
         line = f"[{stamp}] {entry}"
         self.history.appendleft(line)
-        self.history_list.clear()
-        self.history_list.addItems(self.history)
+        self.history_list.insertItem(0, line)
+        while self.history_list.count() > self.history.maxlen:
+            self.history_list.takeItem(self.history_list.count() - 1)
 
     def export_texts(self):
         target, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Зберегти результати", str(self.last_save_dir / "result.txt"), "Text Files (*.txt)")
         if not target:
             return
+        self.flush_stt_pending()
+        lines = [
+            "=== Speech-to-Text ===\n",
+            self.stt_text.toPlainText().strip(),
+            "\n\n=== Text-to-Speech ===\n",
+            self.tts_text.toPlainText().strip(),
+            "\n\n=== Історія ===\n",
+            *(item + "\n" for item in self.history),
+        ]
         try:
-            with open(target, "w", encoding="utf-8") as f:
-                f.write("=== Speech-to-Text ===\n")
-                f.write(self.stt_text.toPlainText().strip() + "\n\n")
-                f.write("=== Text-to-Speech ===\n")
-                f.write(self.tts_text.toPlainText().strip() + "\n\n")
-                f.write("=== Історія ===\n")
-                for item in self.history:
-                    f.write(item + "\n")
+            with open(target, "w", encoding="utf-8", buffering=1 << 20) as f:
+                f.writelines(lines)
             QtWidgets.QMessageBox.information(self, "Успішно", "Файл успішно збережено.")
             self.last_save_dir = Path(target).parent
             self.save_settings()
@@ -388,36 +809,39 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.critical(self, "Помилка", f"Не вдалося зберегти файл: {exc}")
 
     # ---------- Mic & VU ----------
-    def populate_microphones(self):
-        self.mic_combo.clear()
-        self.active_mics = []
-        pa = None
+    def _open_pyaudio(self) -> Optional[pyaudio.PyAudio]:
         try:
-            pa = pyaudio.PyAudio()
-            for idx in range(pa.get_device_count()):
-                info = pa.get_device_info_by_index(idx)
-                if info.get("maxInputChannels", 0) <= 0:
-                    continue
-                try:
-                    pa.is_format_supported(
-                        rate=int(info.get("defaultSampleRate", 16000)),
-                        input_device=idx,
-                        input_channels=1,
-                        input_format=pyaudio.paInt16,
-                    )
-                except Exception:
-                    continue
-                name = info.get("name", f"Device {idx}")
-                self.active_mics.append((idx, name))
+            return pyaudio.PyAudio()
         except Exception:
-            self.active_mics = []
-        finally:
-            if pa:
-                try:
-                    pa.terminate()
-                except Exception:
-                    pass
+            return None
+
+    def _mic_scan_running(self) -> bool:
+        return self._mic_scan is not None and self._mic_scan.isRunning()
 
+    def populate_microphones(self):
+        # Device probing can take a while (notably on WASAPI), so it runs off the GUI thread.
+        # Never while recording: the scan would share the PortAudio instance with the live VU stream.
+        if self._recording_active() or self._mic_scan_running():
+            return
+        self.active_mics = []
+        self.mic_combo.clear()
+        self.mic_combo.addItem("Сканую пристрої…", None)
+        self._mic_scan = MicScanWorker(self._pa, self._mic_probe_cache, self)
+        self._mic_scan.mics_ready.connect(self.on_mics_scanned)
+        self._mic_scan.finished.connect(self._on_mic_scan_finished)
+        self._mic_scan.start()
+
+    def _on_mic_scan_finished(self):
+        # Each refresh creates a new worker; release the finished one instead of keeping it as a child
+        worker = self.sender()
+        if worker is self._mic_scan:
+            self._mic_scan = None
+        if worker is not None:
+            worker.deleteLater()
+
+    def on_mics_scanned(self, active_mics: list):
+        self.active_mics = active_mics
+        self.mic_combo.clear()
         for idx, name in self.active_mics:
             self.mic_combo.addItem(f"{idx}: {name}", idx)
         if not self.active_mics:
@@ -442,17 +866,21 @@ class MainWindow(QtWidgets.QMainWindow):
         self.stop_vu_meter()
         if device_index is None:
             return
+        with self._vu_lock:
+            self._vu_level = 0
+        if not self._pa:
+            return
         try:
-            self.vu_audio = pyaudio.PyAudio()
-            device_info = self.vu_audio.get_device_info_by_index(device_index)
+            device_info = self._pa.get_device_info_by_index(device_index)
             rate = int(device_info.get("defaultSampleRate", 16000))
-            self.vu_stream = self.vu_audio.open(
+            self.vu_stream = self._pa.open(
                 format=pyaudio.paInt16,
                 channels=1,
                 rate=rate,
                 input=True,
                 input_device_index=device_index,
-                frames_per_buffer=1024,
+                frames_per_buffer=256,
+                stream_callback=self._vu_cb,
             )
             self.vu_timer.start()
         except Exception:
@@ -467,28 +895,49 @@ class MainWindow(QtWidgets.QMainWindow):
             except Exception:
                 pass
         self.vu_stream = None
-        if self.vu_audio:
+        self.vu_meter.setValue(0)
+
+    def rescan_hardware(self):
+        if self._recording_active():
+            QtWidgets.QMessageBox.information(self, "Пристрої", "Зупиніть запис перед скануванням обладнання.")
+            return
+        if self._mic_scan_running():
+            return
+        # PortAudio snapshots the device list on init, so a real rescan needs a fresh instance
+        self.stop_vu_meter()
+        if self._pa:
             try:
-                self.vu_audio.terminate()
+                self._pa.terminate()
             except Exception:
                 pass
-        self.vu_audio = None
-        self.vu_meter.setValue(0)
+        self._pa = self._open_pyaudio()
+        self._mic_probe_cache.clear()
+        self._mic_energy.clear()
+        self.populate_microphones()
+
+    def _vu_cb(self, in_data, frame_count, time_info, status):
+        # Runs on the PortAudio thread; only the resulting level is shared with the GUI
+        try:
+            peak = audioop.max(in_data, 2)
+            level = min(100, peak * 100 // 32767)
+        except Exception:
+            level = 0
+        with self._vu_lock:
+            # Instant attack, gradual release, so short peaks stay visible between GUI ticks
+            self._vu_level = max(level, self._vu_level * 4 // 5)
+        return None, pyaudio.paContinue
 
     def update_vu_level(self):
         if not self.vu_stream:
             self.vu_meter.setValue(0)
             return
-        try:
-            data = self.vu_stream.read(1024, exception_on_overflow=False)
-            rms = audioop.rms(data, 2)
-            level = min(100, int(rms / 300))
-            self.vu_meter.setValue(level)
-        except Exception:
-            self.vu_meter.setValue(0)
+        with self._vu_lock:
+            level = self._vu_level
+        self.vu_meter.setValue(level)
 
     # ---------- Clipboard ----------
     def copy_stt_text(self):
+        self.flush_stt_pending()
         text = self.stt_text.toPlainText().strip()
         if not text:
             QtWidgets.QMessageBox.information(self, "Копіювання", "Немає тексту для копіювання.")
@@ -507,9 +956,11 @@ class MainWindow(QtWidgets.QMainWindow):
     # JSON config helpers
     def load_config(self):
         try:
-            data = json.loads(self.config_path.read_text(encoding="utf-8"))
+            raw = self.config_path.read_bytes()
+            data = json.loads(raw.decode("utf-8"))
             if isinstance(data, dict):
                 self.config = data
+                self._last_config_payload = raw
         except FileNotFoundError:
             self.config = {}
         except Exception:
@@ -522,9 +973,26 @@ class MainWindow(QtWidgets.QMainWindow):
         except (TypeError, ValueError):
             return default
 
+    def _open_config_writer(self) -> Optional[UringFileWriter]:
+        if liburing is None:
+            return None
+        try:
+            return UringFileWriter()
+        except Exception as exc:  # noqa: BLE001
+            # UringFileWriter targets the liburing 2024.5.x API; newer releases dropped io_uring()
+            log.warning("io_uring unavailable (%s); config.json is written synchronously", exc)
+            return None
+
     def _write_config_file(self):
+        payload = json.dumps(self.config, ensure_ascii=False, indent=2).encode("utf-8")
+        if payload == self._last_config_payload:
+            return
         try:
-            self.config_path.write_text(json.dumps(self.config, ensure_ascii=False, indent=2), encoding="utf-8")
+            if self._config_writer:
+                self._config_writer.write(self.config_path, payload)
+            else:
+                write_file_synced(self.config_path, payload)
+            self._last_config_payload = payload
         except Exception:
             pass
 
@@ -541,21 +1009,17 @@ class MainWindow(QtWidgets.QMainWindow):
         if 0 <= speed_idx < self.speed_combo.count():
             self.speed_combo.setCurrentIndex(speed_idx)
         self.volume_slider.setValue(volume)
-        saved_mic = self.config.get("audio_mic_index")
-        try:
-            if saved_mic is not None:
-                saved_idx = int(saved_mic)
-                combo_index = self.mic_combo.findData(saved_idx)
-                if combo_index >= 0:
-                    self.mic_combo.setCurrentIndex(combo_index)
-        except (TypeError, ValueError):
-            pass
+        # the saved microphone is selected in on_mics_scanned once the device scan completes
         # finished initial load; allow saves after this
         self.loading_config = False
 
     def save_settings(self):
         if getattr(self, "loading_config", False):
             return
+        self._save_timer.start()
+
+    def _do_save_settings(self):
+        self._save_timer.stop()
         self.config["lang_stt_index"] = self.stt_lang.currentIndex()
         self.config["lang_tts_index"] = self.tts_lang.currentIndex()
         self.config["tts_speed_index"] = self.speed_combo.currentIndex()
@@ -570,7 +1034,28 @@ class MainWindow(QtWidgets.QMainWindow):
         self._write_config_file()
 
     def closeEvent(self, event):  # noqa: N802
-        self.save_settings()
+        # Stop feeding the pool, then let in-flight recognitions finish before the window goes away
+        self._closing = True
+        if self._recording_active():
+            self.stop_recording()
+        self._stt_pool.clear()
+        self._stt_pool.waitForDone()
+        if not self.loading_config:
+            self._do_save_settings()
+        if self._config_writer:
+            self._config_writer.close()
+            self._config_writer = None
+        self.stop_vu_meter()
+        if self._mic_scan is not None:
+            self._mic_scan.wait()
+        for worker in list(self._mic_calibrations):
+            worker.wait()
+        if self._pa:
+            try:
+                self._pa.terminate()
+            except Exception:
+                pass
+            self._pa = None
         super().closeEvent(event)
 
 